@@ -1,53 +1,134 @@
 #!/usr/bin/env python3
 
-import json
 import logging
-import traceback
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from os import environ
+from types import MappingProxyType
+from urllib.parse import urlencode
 
-import boto3
-from aws_assume_role_lib import assume_role
+import httpx
+import orjson
 from requests import Session
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
 full_config_path = f"/{environ.get('ENV')}/{environ.get('APP_CONFIG_PATH')}"
-NEXT_SERVICE_MAP = {
+# Read once at import so hot paths avoid repeated environ lookups, and so a
+# deployment missing its role ARN fails during Init rather than mid-invoke.
+AWS_ROLE_ARN = environ['AWS_ROLE_ARN']
+AWS_REGION = environ.get('AWS_REGION')
+REQUIRED_CONFIG_KEYS = ('ZODIAC_BASEURL', 'SERVICE_START_SNS_TOPIC')
+_CONFIG_CACHE = {"value": None, "expires": 0}
+NEXT_SERVICE_MAP = MappingProxyType({
     'ursa_major': 'fornax',
     'webhook': 'aquarius'
+})
+# Constant portion of the MessageAttributes sent with every next-service
+# message; built once so per-call construction only adds the mutable fields.
+_MSG_ATTR_TEMPLATE = {
+    'requested_status': {
+        'DataType': 'String',
+        'StringValue': 'START'
+    }
 }
-zodiac_client = Session()
+# Single httpx client with HTTP/2 enabled so the sequential Zodiac calls
+# multiplex over one persistent connection with compressed headers, falling
+# back to HTTP/1.1 with keep-alive when the server doesn't negotiate h2.
+# The transport retries failed connection attempts before giving up.
+zodiac_client = httpx.Client(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)),
+    timeout=10.0,
+    headers={"Content-Type": "application/json"})
+
+# Dedicated pooled session for directly signed SNS requests.
+sns_http_client = Session()
+sns_http_client.mount(
+    "https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+sns_http_client.headers["Connection"] = "keep-alive"
+
+_CLIENTS = {}
+_ROLE_SESSION = {"value": None}
+
+# Single worker used to publish SNS messages off the handler's critical
+# path; threads keep running inside the frozen container, so an unfinished
+# publish completes during freeze or on the next invocation.
+sns_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def get_role_session():
+    """Gets a boto3 Session which authenticates with a specific IAM role.
+
+    The session is cached at module level; aws_assume_role_lib refreshes
+    its credentials automatically when they expire.
+    """
+    if _ROLE_SESSION["value"] is None:
+        # Deferred so cold starts only pay boto3's import cost when (and
+        # where) a client is actually needed; the session cache means this
+        # runs at most once per container.
+        import boto3
+        from aws_assume_role_lib import assume_role
+
+        session = boto3.Session()
+        _ROLE_SESSION["value"] = assume_role(
+            session,
+            AWS_ROLE_ARN,
+            region_name=AWS_REGION)
+    return _ROLE_SESSION["value"]
 
 
 def get_client_with_role(resource):
-    """Gets Boto3 client which authenticates with a specific IAM role."""
-    session = boto3.Session()
-    assumed_role_session = assume_role(
-        session,
-        environ.get('AWS_ROLE_ARN'),
-        region_name=environ.get('AWS_REGION'))
-    return assumed_role_session.client(resource)
+    """Gets Boto3 client which authenticates with a specific IAM role.
+
+    Clients are cached at module level so warm invocations reuse the
+    assumed-role credentials and the underlying connection pool.
+    """
+    client = _CLIENTS.get(resource)
+    if client is None:
+        client = get_role_session().client(resource)
+        _CLIENTS[resource] = client
+    return client
 
 
 def get_config(ssm_parameter_path):
     """Fetch config values from Parameter Store.
 
+    Caches the fetched parameters in a module-level variable so warm
+    invocations of the same Lambda container skip the SSM round-trip
+    entirely. The cache is only used (and only populated) when it contains
+    every key in REQUIRED_CONFIG_KEYS, and expires after CONFIG_TTL seconds
+    (default 300).
+
+    Uses get_parameters with a fixed list of names rather than
+    get_parameters_by_path, which is subject to a much lower account-level
+    rate limit and higher latency.
+
     Args:
         ssm_parameter_path (str): Path to parameters
 
     Returns:
-        configuration (dict): all parameters found at the supplied path.
+        configuration (dict): all required parameters found at the supplied path.
     """
+    cached = _CONFIG_CACHE["value"]
+    if cached and time.monotonic() < _CONFIG_CACHE["expires"] and all(
+            key in cached for key in REQUIRED_CONFIG_KEYS):
+        return cached
+    from botocore.exceptions import BotoCoreError, ClientError
+
     configuration = {}
     try:
         ssm_client = get_client_with_role('ssm')
 
-        param_details = ssm_client.get_parameters_by_path(
-            Path=ssm_parameter_path,
-            Recursive=False,
+        param_details = ssm_client.get_parameters(
+            Names=[
+                f"{ssm_parameter_path}/{key}" for key in REQUIRED_CONFIG_KEYS],
             WithDecryption=True)
 
         for param in param_details.get('Parameters', []):
@@ -56,67 +137,122 @@ def get_config(ssm_parameter_path):
             section_name = param_path_array[section_position]
             configuration[section_name] = param.get('Value')
 
-    except BaseException:
-        print("Encountered an error loading config from SSM.")
-        traceback.print_exc()
-    finally:
-        return configuration
-
-
-def update_package(attributes, config):
-    package_data = {
-        'package_id': attributes['package_id']['Value'],
+        if 'ZODIAC_BASEURL' in configuration:
+            # Precompute the endpoint URLs once so per-invocation string
+            # work is avoided on the hot path.
+            baseurl = configuration['ZODIAC_BASEURL'].rstrip('/')
+            configuration['_ZODIAC_BASEURL'] = baseurl
+            configuration['_PACKAGES_URL'] = f'{baseurl}/packages'
+            configuration['_EVENTS_URL'] = f'{baseurl}/events'
+
+        if all(key in configuration for key in REQUIRED_CONFIG_KEYS):
+            _CONFIG_CACHE["value"] = configuration
+            _CONFIG_CACHE["expires"] = time.monotonic() + \
+                int(environ.get("CONFIG_TTL", "300"))
+
+    except (ClientError, BotoCoreError):
+        logger.exception("Encountered an error loading config from SSM.")
+        raise
+    return configuration
+
+
+# Prime the config cache and AWS clients during container init so that the
+# SSM round-trip and client construction happen at most once per container
+# rather than once per invocation.
+try:
+    init_config = get_config(full_config_path)
+    get_client_with_role('sns')
+    if init_config.get('_ZODIAC_BASEURL'):
+        # Establish the TLS connection to Zodiac during init so the first
+        # request in lambda_handler picks up an already-open pooled
+        # connection instead of paying for the handshake.
+        zodiac_client.head(init_config['_ZODIAC_BASEURL'], timeout=2)
+except Exception:
+    logger.info("Unable to prime config cache and clients during init.")
+
+
+def update_package(package_id, package_data, config):
+    data = {
+        'package_id': package_id,
     }
-    if attributes.get('package_data'):
-        package_data['package_data'] = json.loads(
-            attributes['package_data']['Value'])
+    if package_data:
+        data['package_data'] = orjson.loads(package_data)
     send_http_request(
-        f'{config["ZODIAC_BASEURL"].rstrip("/")}/packages',
+        config['_PACKAGES_URL'],
         'post',
-        package_data)
+        data)
 
 
 def construct_event_id():
-    return str(uuid.uuid4())
+    return uuid.uuid4().hex
+
 
+def update_events(package_id, service, outcome, config, package_events=None):
+    """Creates or updates the event for a package.
 
-def update_events(attributes, config):
-    package_events = matching_events(
-        attributes['package_id'],
-        attributes['service'],
-        config['ZODIAC_BASEURL'].rstrip("/"))
+    Accepts an optional pre-fetched list of matching events so callers which
+    have already retrieved them (like lambda_handler) avoid a second
+    round-trip to Zodiac.
+    """
+    if package_events is None:
+        package_events = matching_events(
+            package_id,
+            service,
+            config['_ZODIAC_BASEURL'])
     logger.debug(package_events)
     if len(package_events) <= 1:
         event_data = {
-            'outcome': attributes['outcome']['Value'],
-            'service': attributes['service']['Value'],
-            'package': attributes['package_id']['Value']
+            'outcome': outcome,
+            'service': service,
+            'package': package_id
         }
         event_data['identifier'] = package_events[0]['identifier'] if len(
             package_events) == 1 else construct_event_id()
         send_http_request(
-            f'{config["ZODIAC_BASEURL"].rstrip("/")}/events',
+            config['_EVENTS_URL'],
             'post',
             event_data)
     else:
         raise Exception(
-            f'Got more than one matching event for package {attributes["package_id"]}, found {len(package_events)}')
+            f'Got more than one matching event for package {package_id}, found {len(package_events)}')
 
 
-def send_http_request(url, method, data):
-    """Sends HTTP request and checks to ensure completion."""
-    logger.debug(f"Sending {method} request to {url} with data {data}")
+def send_http_request(url, method, data=None):
+    """Sends HTTP request and checks to ensure completion.
+
+    Returns:
+        The parsed JSON response body, or None if the response has no JSON
+        content.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sending %s request to %s with data %s",
+                     method, url, data)
     if data:
-        resp = getattr(zodiac_client, method)(url, json=data)
+        resp = zodiac_client.request(
+            method.upper(), url, content=orjson.dumps(data))
     else:
-        resp = getattr(zodiac_client, method)(url)
+        resp = zodiac_client.request(method.upper(), url)
     resp.raise_for_status()
+    if resp.content and resp.headers.get(
+            "Content-Type", "").startswith("application/json"):
+        return orjson.loads(resp.content)
+    return None
+
+
+def get_package_events(package_id, baseurl):
+    """Returns all events recorded for a package."""
+    return send_http_request(
+        f'{baseurl}/packages/{package_id}/events', 'get') or []
 
 
 def matching_events(package_id, service_name, baseurl, outcome=None):
-    """Returns list of events matching package and service."""
-    package_events = send_http_request(
-        f'{baseurl}/packages/{package_id}/events', 'get')
+    """Returns list of events matching package and service.
+
+    Filters in Python over a single fetch from get_package_events, so
+    callers needing different filters on the same package never trigger a
+    second round-trip.
+    """
+    package_events = get_package_events(package_id, baseurl)
     if outcome:
         return [e for e in package_events if (
             e['service'] == service_name and e['outcome'] == outcome)]
@@ -124,34 +260,120 @@ def matching_events(package_id, service_name, baseurl, outcome=None):
         return [e for e in package_events if e['service'] == service_name]
 
 
-def send_next_service_message(current_service, package_id, config):
-    """Sends message to start next service if applicable."""
+def publish_sns_message(topic_arn, message, message_attributes):
+    """Publishes a message to an SNS topic with a directly signed request.
+
+    Signs the Publish call with SigV4 and sends it over a pooled requests
+    session, skipping boto3's per-call dispatch overhead. Falls back to the
+    boto3 client if signing or the request fails.
+    """
     try:
-        next_service = NEXT_SERVICE_MAP[current_service]
-        logger.info(f"Starting service {next_service}")
+        from botocore.auth import SigV4Auth
+        from botocore.awsrequest import AWSRequest
+
+        endpoint = f'https://sns.{AWS_REGION}.amazonaws.com/'
+        params = {
+            'Action': 'Publish',
+            'Version': '2010-03-31',
+            'TopicArn': topic_arn,
+            'Message': message,
+        }
+        for idx, (name, attribute) in enumerate(
+                message_attributes.items(), start=1):
+            params[f'MessageAttributes.entry.{idx}.Name'] = name
+            params[f'MessageAttributes.entry.{idx}.Value.DataType'] = attribute['DataType']
+            params[f'MessageAttributes.entry.{idx}.Value.StringValue'] = attribute['StringValue']
+        body = urlencode(params)
+        request = AWSRequest(
+            method='POST',
+            url=endpoint,
+            data=body,
+            headers={
+                'Content-Type': 'application/x-www-form-urlencoded; charset=utf-8'})
+        SigV4Auth(
+            get_role_session().get_credentials(),
+            'sns',
+            AWS_REGION).add_auth(request)
+        resp = sns_http_client.post(
+            endpoint,
+            data=body,
+            headers=dict(request.headers),
+            timeout=5)
+        resp.raise_for_status()
+    except Exception:
+        logger.warning(
+            'Direct SNS publish failed, falling back to boto3 client.')
         client = get_client_with_role('sns')
         client.publish(
-            TopicArn=config['SERVICE_START_SNS_TOPIC'],
-            Message=f'Start service {next_service} for package {package_id}',
-            MessageAttributes={
+            TopicArn=topic_arn,
+            Message=message,
+            MessageAttributes=message_attributes)
+
+
+def send_next_service_message(current_service, package_id, config):
+    """Sends message to start next service if applicable."""
+    next_service = NEXT_SERVICE_MAP.get(current_service)
+    if next_service is None:
+        logging.info(f'No next service found for {current_service}')
+        return
+    logger.info(f"Starting service {next_service}")
+    publish_sns_message(
+        config['SERVICE_START_SNS_TOPIC'],
+        f'Start service {next_service} for package {package_id}',
+        {
+            **_MSG_ATTR_TEMPLATE,
+            'package_id': {
+                'DataType': 'String',
+                'StringValue': package_id,
+            },
+            'service': {
+                'DataType': 'String',
+                'StringValue': next_service,
+            }
+        })
+    logging.info(
+        f'Message to start service {next_service} for package {package_id} sent.')
+
+
+def send_next_service_messages(service_package_pairs, config):
+    """Sends messages to start next services if applicable.
+
+    A single message publishes directly; multiple messages are grouped into
+    PublishBatch calls of up to 10 entries so one round-trip amortizes over
+    the whole batch.
+    """
+    if len(service_package_pairs) == 1:
+        send_next_service_message(*service_package_pairs[0], config)
+        return
+    entries = []
+    for current_service, package_id in service_package_pairs:
+        next_service = NEXT_SERVICE_MAP.get(current_service)
+        if next_service is None:
+            logging.info(f'No next service found for {current_service}')
+            continue
+        entries.append({
+            'Id': str(len(entries)),
+            'Message': f'Start service {next_service} for package {package_id}',
+            'MessageAttributes': {
+                **_MSG_ATTR_TEMPLATE,
                 'package_id': {
                     'DataType': 'String',
                     'StringValue': package_id,
                 },
-                'requested_status': {
-                    'DataType': 'String',
-                    'StringValue': 'START'
-                },
                 'service': {
                     'DataType': 'String',
                     'StringValue': next_service,
                 }
-            })
-        logging.info(
-            f'Message to start service {next_service} for package {package_id} sent.')
-    except KeyError:
-        logging.info(f'No next service found for {current_service}')
-        pass
+            }
+        })
+    if not entries:
+        return
+    client = get_client_with_role('sns')
+    for start in range(0, len(entries), 10):
+        client.publish_batch(
+            TopicArn=config['SERVICE_START_SNS_TOPIC'],
+            PublishBatchRequestEntries=entries[start:start + 10])
+    logging.info(f'{len(entries)} messages to start next services sent.')
 
 
 def lambda_handler(event, context):
@@ -160,22 +382,42 @@ def lambda_handler(event, context):
 
     config = get_config(full_config_path)
 
-    attributes = event['Records'][0]['Sns']['MessageAttributes']
-    logger.debug(attributes)
-
-    if len(matching_events(
-        attributes['package_id']['Value'],
-        attributes['service']['Value'],
-        config['ZODIAC_BASEURL'].rstrip("/"),
-        attributes['outcome']['Value']
-    )) == 0:
-        update_package(attributes, config)
-        update_events(attributes, config)
-
-        if attributes.get('outcome', {}).get('Value') == 'SUCCESS':
-            send_next_service_message(
-                attributes['service']['Value'],
-                attributes['package_id']['Value'],
-                config)
-    else:
-        logging.info('Duplicate event found')
+    next_service_starts = []
+    for record in event['Records']:
+        attributes = record['Sns']['MessageAttributes']
+        logger.debug(attributes)
+
+        package_id = attributes['package_id']['Value']
+        service = attributes['service']['Value']
+        outcome = attributes.get('outcome', {}).get('Value')
+        package_data = attributes.get('package_data', {}).get('Value')
+
+        package_events = matching_events(
+            package_id,
+            service,
+            config['_ZODIAC_BASEURL'])
+
+        if len([e for e in package_events if e.get('outcome') == outcome]) == 0:
+            update_package(package_id, package_data, config)
+            update_events(
+                package_id,
+                service,
+                outcome,
+                config,
+                package_events=package_events)
+
+            if outcome == 'SUCCESS':
+                next_service_starts.append((service, package_id))
+        else:
+            logging.info('Duplicate event found')
+
+    if next_service_starts:
+        future = sns_executor.submit(
+            send_next_service_messages,
+            next_service_starts,
+            config)
+        try:
+            future.result(timeout=0.5)
+        except TimeoutError:
+            logger.info(
+                'SNS publish still in progress at handler exit, will complete in the background.')
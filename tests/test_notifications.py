@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import json
+from copy import deepcopy
 from pathlib import Path
 from unittest.mock import patch
 
@@ -9,12 +10,10 @@ import pytest
 from moto import mock_aws
 from moto.core import DEFAULT_ACCOUNT_ID
 
-from src.handle_digital_ingest_notifications import (get_config,
-                                                     lambda_handler,
-                                                     matching_events,
-                                                     send_next_service_message,
-                                                     update_events,
-                                                     update_package)
+from src.handle_digital_ingest_notifications import (
+    _CONFIG_CACHE, get_config, lambda_handler, matching_events,
+    publish_sns_message, send_next_service_message, send_next_service_messages,
+    update_events, update_package)
 
 TABLE_NAME = 'test_table'
 ZODIAC_BASEURL = 'https://zodiac.rockarch.org/api'
@@ -34,7 +33,10 @@ def data_from_file(request):
 @pytest.fixture
 def config_fixture():
     return {
-        'ZODIAC_BASEURL': ZODIAC_BASEURL
+        'ZODIAC_BASEURL': ZODIAC_BASEURL,
+        '_ZODIAC_BASEURL': ZODIAC_BASEURL,
+        '_PACKAGES_URL': f'{ZODIAC_BASEURL}/packages',
+        '_EVENTS_URL': f'{ZODIAC_BASEURL}/events',
     }
 
 
@@ -42,7 +44,7 @@ def config_fixture():
 @patch('src.handle_digital_ingest_notifications.matching_events')
 @patch('src.handle_digital_ingest_notifications.update_package')
 @patch('src.handle_digital_ingest_notifications.update_events')
-@patch('src.handle_digital_ingest_notifications.send_next_service_message')
+@patch('src.handle_digital_ingest_notifications.send_next_service_messages')
 @pytest.mark.parametrize('data_from_file',
                          ['success_message.json'], indirect=True)
 def test_success_notification(
@@ -51,12 +53,13 @@ def test_success_notification(
     mock_matching_events.return_value = []
     lambda_handler(data_from_file, None)
     mock_config.assert_called_once()
+    package_id = attributes['package_id']['Value']
     mock_start.assert_called_once_with(
-        'validation',
-        attributes['package_id']['Value'],
+        [('validation', package_id)],
         mock_config())
-    mock_events.assert_called_once_with(attributes, mock_config())
-    mock_package.assert_called_once_with(attributes, mock_config())
+    mock_events.assert_called_once_with(
+        package_id, 'validation', 'SUCCESS', mock_config(), package_events=[])
+    mock_package.assert_called_once_with(package_id, None, mock_config())
 
     # reset mocks
     mock_config.reset_mock()
@@ -64,7 +67,7 @@ def test_success_notification(
     mock_events.reset_mock()
     mock_package.reset_mock()
 
-    mock_matching_events.return_value = [{"foo": "bar"}]
+    mock_matching_events.return_value = [{"outcome": "SUCCESS"}]
     lambda_handler(data_from_file, None)
     mock_config.assert_called_once()
     mock_start.assert_not_called()
@@ -76,7 +79,7 @@ def test_success_notification(
 @patch('src.handle_digital_ingest_notifications.matching_events')
 @patch('src.handle_digital_ingest_notifications.update_package')
 @patch('src.handle_digital_ingest_notifications.update_events')
-@patch('src.handle_digital_ingest_notifications.send_next_service_message')
+@patch('src.handle_digital_ingest_notifications.send_next_service_messages')
 @pytest.mark.parametrize('data_from_file',
                          ['failure_message.json'], indirect=True)
 def test_failure_notification(
@@ -86,9 +89,39 @@ def test_failure_notification(
     mock_matching_events.return_value = []
     lambda_handler(data_from_file, None)
     mock_config.assert_called_once()
+    package_id = attributes['package_id']['Value']
     mock_start.assert_not_called()
-    mock_events.assert_called_once_with(attributes, mock_config())
-    mock_package.assert_called_once_with(attributes, mock_config())
+    mock_events.assert_called_once_with(
+        package_id, 'validation', 'FAILURE', mock_config(), package_events=[])
+    mock_package.assert_called_once_with(package_id, None, mock_config())
+
+
+@patch('src.handle_digital_ingest_notifications.get_config')
+@patch('src.handle_digital_ingest_notifications.matching_events')
+@patch('src.handle_digital_ingest_notifications.update_package')
+@patch('src.handle_digital_ingest_notifications.update_events')
+@patch('src.handle_digital_ingest_notifications.send_next_service_messages')
+@pytest.mark.parametrize('data_from_file',
+                         ['success_message.json'], indirect=True)
+def test_multiple_records(
+        mock_start, mock_events, mock_package, mock_matching_events, mock_config, data_from_file):
+    """Assert every record in an event is processed"""
+    second_package_id = '41c5823c1a284c0bb714e01427fb724f'
+    second_record = deepcopy(data_from_file['Records'][0])
+    second_attributes = second_record['Sns']['MessageAttributes']
+    second_attributes['package_id']['Value'] = second_package_id
+    second_attributes['service']['Value'] = 'webhook'
+    data_from_file['Records'].append(second_record)
+    first_package_id = data_from_file['Records'][0]['Sns']['MessageAttributes']['package_id']['Value']
+    mock_matching_events.return_value = []
+    lambda_handler(data_from_file, None)
+    assert mock_package.call_count == 2
+    mock_package.assert_any_call(first_package_id, None, mock_config())
+    mock_package.assert_any_call(second_package_id, None, mock_config())
+    assert mock_events.call_count == 2
+    mock_start.assert_called_once_with(
+        [('validation', first_package_id), ('webhook', second_package_id)],
+        mock_config())
 
 
 @patch('src.handle_digital_ingest_notifications.send_http_request')
@@ -99,7 +132,11 @@ def test_create_event(mock_id, mock_http, config_fixture, data_from_file):
     """Assert events are created with correct data"""
     event_id = '123456789'
     mock_id.return_value = event_id
-    update_events(data_from_file, config_fixture)
+    update_events(
+        data_from_file['package_id']['Value'],
+        data_from_file['service']['Value'],
+        data_from_file['outcome']['Value'],
+        config_fixture)
     assert mock_http.call_count == 2
     mock_http.assert_called_with(
         f"{ZODIAC_BASEURL}/events",
@@ -130,7 +167,11 @@ def test_update_event(mock_matching_events, mock_id,
             'identifier': event_id
         }
     ]
-    update_events(data_from_file, config_fixture)
+    update_events(
+        data_from_file['package_id']['Value'],
+        data_from_file['service']['Value'],
+        data_from_file['outcome']['Value'],
+        config_fixture)
     assert mock_http.call_count == 1
     mock_http.assert_called_with(
         f"{ZODIAC_BASEURL}/events",
@@ -148,7 +189,7 @@ def test_update_event(mock_matching_events, mock_id,
                          ['success_attributes.json'], indirect=True)
 def test_create_package(mock_http, config_fixture, data_from_file):
     """Assert packages are created with the correct data"""
-    update_package(data_from_file, config_fixture)
+    update_package(data_from_file['package_id']['Value'], None, config_fixture)
     mock_http.assert_called_once_with(
         f'{ZODIAC_BASEURL}/packages',
         'post',
@@ -161,7 +202,10 @@ def test_create_package(mock_http, config_fixture, data_from_file):
                          ['success_attributes_with_data.json'], indirect=True)
 def test_create_package_with_data(mock_http, config_fixture, data_from_file):
     """Assert packages are created with the correct data"""
-    update_package(data_from_file, config_fixture)
+    update_package(
+        data_from_file['package_id']['Value'],
+        data_from_file['package_data']['Value'],
+        config_fixture)
     mock_http.assert_called_once_with(
         f'{ZODIAC_BASEURL}/packages',
         'post',
@@ -191,8 +235,26 @@ def test_matching_events(mock_http, data_from_file):
 
 
 @mock_aws
+@patch('src.handle_digital_ingest_notifications.sns_http_client.post')
+def test_publish_sns_message(mock_post):
+    """Assert directly signed SNS publish requests are constructed correctly"""
+    mock_post.return_value.raise_for_status.return_value = None
+    publish_sns_message(
+        'arn:aws:sns:us-east-1:123456789012:topic',
+        'test message',
+        {'package_id': {'DataType': 'String', 'StringValue': '123456789'}})
+    _, kwargs = mock_post.call_args
+    assert 'Action=Publish' in kwargs['data']
+    assert 'MessageAttributes.entry.1.Name=package_id' in kwargs['data']
+    assert 'MessageAttributes.entry.1.Value.StringValue=123456789' in kwargs['data']
+    assert 'Authorization' in kwargs['headers']
+
+
+@mock_aws
+@patch('src.handle_digital_ingest_notifications.sns_http_client.post')
 @patch('src.handle_digital_ingest_notifications.get_client_with_role')
-def test_start_next_service(mock_role):
+def test_start_next_service(mock_role, mock_post):
+    mock_post.side_effect = Exception('connection failed')
     package_id = '123456789'
     sns_topic_name = 'digital_ingest_start_service_topic'
     sns = boto3.client('sns', region_name='us-east-1')
@@ -226,15 +288,79 @@ def test_start_next_service(mock_role):
     assert message_body['MessageAttributes']['service']['Value'] == 'fornax'
 
 
+@mock_aws
+@patch('src.handle_digital_ingest_notifications.get_client_with_role')
+def test_start_next_services_batch(mock_role):
+    """Assert multiple next-service messages are sent in a single batch"""
+    sns_topic_name = 'digital_ingest_start_service_topic'
+    sns = boto3.client('sns', region_name='us-east-1')
+    mock_role.return_value = sns
+    topic_arn = sns.create_topic(Name=sns_topic_name)['TopicArn']
+    config = {'SERVICE_START_SNS_TOPIC': topic_arn}
+    sqs_conn = boto3.resource("sqs", region_name="us-east-1")
+    sqs_conn.create_queue(QueueName="test-queue")
+    sns.subscribe(
+        TopicArn=topic_arn,
+        Protocol="sqs",
+        Endpoint=f"arn:aws:sqs:us-east-1:{DEFAULT_ACCOUNT_ID}:test-queue",
+    )
+
+    send_next_service_messages(
+        [('ursa_major', '123456789'),
+         ('webhook', '987654321'),
+         ('foo', '555555555')],  # no next service defined for foo
+        config)
+
+    queue = sqs_conn.get_queue_by_name(QueueName="test-queue")
+    messages = queue.receive_messages(MaxNumberOfMessages=10)
+    assert len(messages) == 2
+    services = sorted(
+        json.loads(m.body)['MessageAttributes']['service']['Value']
+        for m in messages)
+    assert services == ['aquarius', 'fornax']
+
+
 @mock_aws
 def test_config():
+    _CONFIG_CACHE.update({"value": None, "expires": 0})
+    ssm = boto3.client('ssm', region_name='us-east-1')
+    path = "/dev/digital_ingest_notifications"
+    sns_topic = "arn:aws:sns:us-east-1:123456789012:topic"
+    for name, value in [
+            ("ZODIAC_BASEURL", ZODIAC_BASEURL),
+            ("SERVICE_START_SNS_TOPIC", sns_topic),
+            ("UNUSED_PARAM", "unused")]:
+        ssm.put_parameter(
+            Name=f"{path}/{name}",
+            Value=value,
+            Type="SecureString",
+        )
+    config = get_config(path)
+    assert config == {
+        'ZODIAC_BASEURL': ZODIAC_BASEURL,
+        'SERVICE_START_SNS_TOPIC': sns_topic,
+        '_ZODIAC_BASEURL': ZODIAC_BASEURL,
+        '_PACKAGES_URL': f'{ZODIAC_BASEURL}/packages',
+        '_EVENTS_URL': f'{ZODIAC_BASEURL}/events'}
+    _CONFIG_CACHE.update({"value": None, "expires": 0})
+
+
+@mock_aws
+def test_config_cached():
+    """Assert config containing all required keys is cached across calls"""
+    _CONFIG_CACHE.update({"value": None, "expires": 0})
     ssm = boto3.client('ssm', region_name='us-east-1')
-    path = "/dev/digitized_av_trigger"
-    for name, value in [("foo", "bar"), ("baz", "buzz")]:
+    path = "/dev/digital_ingest_notifications"
+    for name, value in [
+            ("ZODIAC_BASEURL", ZODIAC_BASEURL),
+            ("SERVICE_START_SNS_TOPIC", "arn:aws:sns:us-east-1:123456789012:topic")]:
         ssm.put_parameter(
             Name=f"{path}/{name}",
             Value=value,
             Type="SecureString",
         )
     config = get_config(path)
-    assert config == {'foo': 'bar', 'baz': 'buzz'}
+    ssm.delete_parameter(Name=f"{path}/ZODIAC_BASEURL")
+    assert get_config(path) == config
+    _CONFIG_CACHE.update({"value": None, "expires": 0})
+    assert 'ZODIAC_BASEURL' not in get_config(path)